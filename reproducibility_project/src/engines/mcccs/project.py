@@ -1,8 +1,10 @@
 """Setup for signac, signac-flow, signac-dashboard for running MCCCS-MN simulations for the reproducibility study."""
-import fileinput
+import contextlib
+import functools
 import math
 import os
 import pathlib
+import re
 import shutil
 from glob import glob
 
@@ -14,11 +16,16 @@ from flow.environment import DefaultSlurmEnvironment
 class Project(flow.FlowProject):
     """Subclass of FlowProject to provide custom methods and attributes."""
 
-    def __init__(self):
-        super().__init__()
+    @functools.cached_property
+    def data_dir(self):
+        """Return the data directory, resolved on first access."""
         current_path = pathlib.Path(os.getcwd()).absolute()
-        self.data_dir = current_path.parents[1] / "data"
-        self.ff_fn = self.data_dir / "forcefield.xml"
+        return current_path.parents[1] / "data"
+
+    @functools.cached_property
+    def ff_fn(self):
+        """Return the path of the forcefield file in the data directory."""
+        return self.data_dir / "forcefield.xml"
 
 
 class Metropolis(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
@@ -32,6 +39,62 @@ class Metropolis(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
 ex = Project.make_group(name="ex")
 
 
+def _statepoint(job):
+    """Return the cheapest read-only view of the job statepoint.
+
+    Statepoints never change for a job, so on signac >= 2.2 hot conditions and
+    operations read them from memory. Older releases fall back to job.sp, as
+    job.statepoint() builds a full copy of the statepoint on every call.
+    """
+    try:
+        return job.cached_statepoint  # signac >= 2.2
+    except AttributeError:
+        return job.sp
+
+
+def is_mcccs(job):
+    """Check if the job is run with MCCCS-MN."""
+    return _statepoint(job)["engine"] == "mcccs"
+
+
+def is_mcccs_npt(job):
+    """Check if the job is an NPT simulation run with MCCCS-MN."""
+    sp = _statepoint(job)
+    return sp["engine"] == "mcccs" and sp["ensemble"] == "NPT"
+
+
+def is_mcccs_gemc(job):
+    """Check if the job is a GEMC-NVT simulation run with MCCCS-MN."""
+    sp = _statepoint(job)
+    return sp["engine"] == "mcccs" and sp["ensemble"] == "GEMC-NVT"
+
+
+def save_top_done(job):
+    """Check if the topology files of every box of the job have been saved."""
+    ensemble = _statepoint(job)["ensemble"]
+    if ensemble == "NPT":
+        return _ws_has(job, "init1.pdb", "init1.mol2")
+    if ensemble == "GEMC-NVT":
+        return _ws_has(
+            job, "init1.pdb", "init2.pdb", "init1.mol2", "init2.mol2"
+        )
+    return False
+
+
+@functools.lru_cache(maxsize=1)
+def _root_directory():
+    """Return the project root directory, searched for only once per process."""
+    return Project().root_directory()
+
+
+@functools.lru_cache(maxsize=None)
+def _engine_input_dir(molecule, ensemble):
+    """Return the engine_input directory for a molecule and ensemble."""
+    return _root_directory() + "/src/engine_input/mcccs/{}/{}".format(
+        molecule, ensemble
+    )
+
+
 def mc3s_exec():
     """Return the path of MCCCS-MN executable."""
     return "/home/rs/software/MCCCS-MN-10-21/exe-ifort-10-21/src/topmon"
@@ -39,30 +102,32 @@ def mc3s_exec():
 
 def print_running_string(job, step):
     """Print details about the stage that is starting."""
+    sp = _statepoint(job)
     print(
         "Running {} for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa, replica = {}.".format(
             step,
             job,
-            job.sp.molecule,
-            job.sp.ensemble,
-            job.sp.temperature,
-            job.sp.pressure,
-            job.sp.replica,
+            sp["molecule"],
+            sp["ensemble"],
+            sp["temperature"],
+            sp["pressure"],
+            sp["replica"],
         )
     )
 
 
 def print_completed_string(job, step):
     """Print details about the stage that just completed."""
+    sp = _statepoint(job)
     print(
         "Completed {} for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa, replica = {}.".format(
             step,
             job,
-            job.sp.molecule,
-            job.sp.ensemble,
-            job.sp.temperature,
-            job.sp.pressure,
-            job.sp.replica,
+            sp["molecule"],
+            sp["ensemble"],
+            sp["temperature"],
+            sp["pressure"],
+            sp["replica"],
         )
     )
 
@@ -70,25 +135,96 @@ def print_completed_string(job, step):
 """Setting progress label"""
 
 
+@functools.lru_cache(maxsize=4096)
+def _ws_listing(ws, mtime):
+    """Return the names in a workspace, cached on the directory mtime."""
+    with os.scandir(ws) as entries:
+        return frozenset(entry.name for entry in entries)
+
+
+def _ws_names(job):
+    """Return the names in the job workspace from the cached listing."""
+    try:
+        mtime = os.stat(job.ws).st_mtime_ns
+    except FileNotFoundError:
+        return frozenset()
+    return _ws_listing(job.ws, mtime)
+
+
+def _ws_has(job, *names):
+    """Check if all the files are in the job workspace.
+
+    The workspace listing is fetched once, so checking several names costs a
+    single stat of the workspace. Directory mtimes can have a resolution as
+    coarse as one second, e.g. on NFS or Lustre, so a file created right after
+    the listing was cached may not change the key. Names missing from the
+    listing are therefore checked on disk before reporting them as absent.
+    """
+    listing = _ws_names(job)
+    return all(
+        name in listing or os.path.exists(os.path.join(job.ws, name))
+        for name in names
+    )
+
+
 @Project.label
 def has_fort_files(job):
     """Check if the job has all four equired fort.4 files."""
-    return (
-        job.isfile("fort.4.melt")
-        and job.isfile("fort.4.cool")
-        and job.isfile("fort.4.equil")
-        and job.isfile("fort.4.prod")
+    return _ws_has(
+        job, "fort.4.melt", "fort.4.cool", "fort.4.equil", "fort.4.prod"
     )
 
 
+def _stat_key(stat):
+    """Return the inode, size and mtime of a stat result as a list."""
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def _files_key(job, file_names):
+    """Return the stat keys of the files, or None if any is missing.
+
+    The inode and size are included so that a file replaced or rewritten
+    within the mtime resolution of the file system still changes the key.
+    """
+    try:
+        return [
+            _stat_key(os.stat(os.path.join(job.ws, name)))
+            for name in file_names
+        ]
+    except FileNotFoundError:
+        return None
+
+
+def _cached_label(job, name, key, compute):
+    """Return a label value stored in the job document while key is unchanged.
+
+    The value is recomputed and stored whenever key differs from the stored
+    one. A key of None disables the cache, e.g. when an input file is missing.
+    """
+    if key is None:
+        return compute()
+    cached = job.doc.get("_label_cache", {}).get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    value = compute()
+    job.doc.setdefault("_label_cache", {})[name] = [key, value]
+    return value
+
+
 @Project.label
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 def files_ready(job):
     """Check if the keywords in the fort.4 files have been replaced."""
-    # Link: https://stackoverflow.com/questions/32749350/check-if-a-string-is-in-a-file-with-python
-    if job.sp.ensemble == "GEMC-NVT":
-        job.doc.files_ready = False
-        file_names = ["melt", "cool", "equil", "prod"]
+    key = _files_key(
+        job, ["fort.4.melt", "fort.4.cool", "fort.4.equil", "fort.4.prod"]
+    )
+    return _cached_label(job, "files_ready", key, lambda: _files_ready(job))
+
+
+def _files_ready(job):
+    """Scan the fort.4 files for keywords that have not been replaced."""
+    sp = _statepoint(job)
+    if sp["ensemble"] == "GEMC-NVT":
         keywords = [
             "NCHAIN1",
             "NCHAIN2",
@@ -105,24 +241,7 @@ def files_ready(job):
             "INIZ2",
             "VARIABLES",
         ]
-        c = 0
-        for name in file_names:
-            file_name = job.ws + "/fort.4." + name
-            i = 0
-            if not job.isfile("fort.4." + name):
-                continue
-            for i in range(len(keywords)):
-                with open(file_name) as myfile:
-                    if keywords[i] in myfile.read():
-                        c += 1
-        if c == 0:
-            job.doc.files_ready = True
-
-        return job.doc.files_ready
-
-    if job.sp.ensemble == "NPT":
-        job.doc.files_ready = False
-        file_names = ["melt", "cool", "equil", "prod"]
+    elif sp["ensemble"] == "NPT":
         keywords = [
             "NCHAIN",
             "LENGTH",
@@ -131,38 +250,41 @@ def files_ready(job):
             "RCUT",
             "VARIABLES",
         ]
-        c = 0
-        for name in file_names:
-            file_name = job.ws + "/fort.4." + name
-            i = 0
-            if not job.isfile("fort.4." + name):
-                continue
-            for i in range(len(keywords)):
-                with open(file_name) as myfile:
-                    if keywords[i] in myfile.read():
-                        c += 1
-        if c == 0:
-            job.doc.files_ready = True
-
-        return job.doc.files_ready
+    else:
+        return None
+    keywords = [keyword.encode() for keyword in keywords]
+    file_names = ["melt", "cool", "equil", "prod"]
+    ready = True
+    for name in file_names:
+        # Read each file once and stop at the first keyword left in any file.
+        try:
+            blob = pathlib.Path(job.ws + "/fort.4." + name).read_bytes()
+        except FileNotFoundError:
+            continue
+        if any(keyword in blob for keyword in keywords):
+            ready = False
+            break
+    job.doc.files_ready = ready
+    return ready
 
 
 @Project.label
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 def topmon_ready(job):
     """Check if the keywords in the topmon have been replaced correctly."""
+    sp = _statepoint(job)
     job.doc.topmon_ready = False
     file_name = job.ws + "/topmon.inp"
-    if not job.isfile("topmon.inp"):
+    if not _ws_has(job, "topmon.inp"):
         return False
-    if job.sp.cutoff_style == "shift":
+    if sp["cutoff_style"] == "shift":
         a = False
         with open(file_name) as myfile:
             if "lshift= T" in myfile.read():
                 a = True
     else:
         a = True
-    if job.sp.long_range_correction == "energy_pressure":
+    if sp["long_range_correction"] == "energy_pressure":
         b = False
         with open(file_name) as myfile:
             if "ltailc= T" in myfile.read():
@@ -175,13 +297,13 @@ def topmon_ready(job):
 @Project.label
 def has_restart_file(job):
     """Check if the job has a restart file."""
-    return job.isfile("fort.77")
+    return _ws_has(job, "fort.77")
 
 
 @Project.label
 def has_topmon(job):
     """Check if the job has a topmon (FF) file."""
-    return job.isfile("topmon.inp")
+    return _ws_has(job, "topmon.inp")
 
 
 @Project.label
@@ -220,28 +342,52 @@ def all_prod_replicates_done(job):
         return False
 
 
+# MCCCS-MN writes this marker at the very end of the run file.
+_RUN_END_MARKER = b"Program ended"
+_RUN_TAIL_BYTES = 4096
+# (job id, step) -> (run file stat key, finished), reused until the file
+# changes.
+_finished_cache = {}
+
+
+def _run_ended(run_file):
+    """Check the tail of a run file for the end of program marker."""
+    with open(run_file, "rb") as myfile:
+        size = os.fstat(myfile.fileno()).st_size
+        offset = max(0, size - _RUN_TAIL_BYTES)
+        myfile.seek(offset)
+        return _RUN_END_MARKER in myfile.read(size - offset)
+
+
+def _stage_finished(job, step):
+    """Check if the run file of a stage reports that the program ended."""
+    run_file = job.ws + "/run.{}".format(step)
+    try:
+        key = _stat_key(os.stat(run_file))
+    except FileNotFoundError:
+        return False
+    cached = _finished_cache.get((job.id, step))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    finished = _cached_label(
+        job, "{}_finished".format(step), key, lambda: _run_ended(run_file)
+    )
+    _finished_cache[(job.id, step)] = (key, finished)
+    return finished
+
+
 @Project.label
 def melt_finished(job):
     """Check if melt stage is finished."""
     step = "melt"
-    run_file = job.ws + "/run.{}".format(step)
-    if job.isfile("run.{}".format(step)):
-        with open(run_file) as myfile:
-            return "Program ended" in myfile.read()
-    else:
-        return False
+    return _stage_finished(job, step)
 
 
 @Project.label
 def cool_finished(job):
     """Check if cool stage is finished."""
     step = "cool"
-    run_file = job.ws + "/run.{}".format(step)
-    if job.isfile("run.{}".format(step)):
-        with open(run_file) as myfile:
-            return "Program ended" in myfile.read()
-    else:
-        return False
+    return _stage_finished(job, step)
 
 
 @Project.label
@@ -252,32 +398,28 @@ def equil_finished(job):
         step = "equil" + str(job.doc.equil_replicates_done - 1)
     except (KeyError, AttributeError):
         step = "equil" + "0"
-
-    run_file = job.ws + "/run.{}".format(step)
-    if job.isfile("run.{}".format(step)):
-        with open(run_file) as myfile:
-            return "Program ended" in myfile.read()
-    else:
-        return False
+    return _stage_finished(job, step)
 
 
 @Project.label
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 def log_exists(job):
     """Check if production log file has been generated."""
-    if job.sp.ensemble == "NPT":
-        return job.isfile("log-npt.txt")
-    elif job.sp.ensemble == "GEMC-NVT":
-        return job.isfile("log-liquid.txt") and job.isfile("log-vapor.txt")
+    sp = _statepoint(job)
+    if sp["ensemble"] == "NPT":
+        return _ws_has(job, "log-npt.txt")
+    elif sp["ensemble"] == "GEMC-NVT":
+        return _ws_has(job, "log-liquid.txt", "log-vapor.txt")
 
 
 @Project.label
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 def traj_exists(job):
     """Check if production traj file has been generated."""
-    if job.sp.ensemble == "NPT":
-        return job.isfile("trajectory-npt.gsd")
-    elif job.sp.ensemble == "GEMC-NVT":
+    sp = _statepoint(job)
+    if sp["ensemble"] == "NPT":
+        return _ws_has(job, "trajectory-npt.gsd")
+    elif sp["ensemble"] == "GEMC-NVT":
         # return job.isfile("trajectory-liquid.gsd") and job.isfile("trajectory-vapor.gsd" )
         return True
         # return job.isfile('log-liquid.txt') and job.isfile('log-vapor.txt')
@@ -287,8 +429,9 @@ def sanitize_npt_log(step, job):
     """Sanitize the output logs for NPT simulations."""
     import numpy as np
 
-    mw = job.sp.mass
-    files = sorted(glob("fort*12*{}*".format(step)))
+    sp = _statepoint(job)
+    mw = sp["mass"]
+    files = sorted(glob(os.path.join(job.ws, "fort*12*{}*".format(step))))
     arrays = []
     for filecurrent in files:
         array = np.genfromtxt(filecurrent, skip_header=1)
@@ -316,7 +459,7 @@ def sanitize_npt_log(step, job):
     arrays = np.append(arrays, temperature, axis=1)  # kinetic_energy
 
     np.savetxt(
-        "{}_log.txt".format(step),
+        os.path.join(job.ws, "{}_log.txt".format(step)),
         arrays,
         header="a \t b  \t c  \t potential_energy \t pressure \t num_molecules \t rho_molecules_per_nm3 \t timestep \t volume \t density \t temperature \t kinetic_energy",
     )
@@ -327,8 +470,9 @@ def sanitize_gemc_log(step, job):
     """Sanitize the output logs for gemc simulations."""
     import numpy as np
 
-    mw = job.sp.mass
-    files = sorted(glob("fort*12*{}*".format(step)))
+    sp = _statepoint(job)
+    mw = sp["mass"]
+    files = sorted(glob(os.path.join(job.ws, "fort*12*{}*".format(step))))
     arrays_box1 = []
     arrays_box2 = []
 
@@ -392,12 +536,12 @@ def sanitize_gemc_log(step, job):
     arrays_box2 = np.append(arrays_box2, temperature, axis=1)  # Kinetic energy
 
     np.savetxt(
-        "{}_log_box1.txt".format(step),
+        os.path.join(job.ws, "{}_log_box1.txt".format(step)),
         arrays_box1,
         header="a \t b\t c \t potential_energy \t pressure \t num_molecules \t rho_molecules_per_nm3 \t timestep \t volume \t density \t temperature \t kinetic_energy",
     )
     np.savetxt(
-        "{}_log_box2.txt".format(step),
+        os.path.join(job.ws, "{}_log_box2.txt".format(step)),
         arrays_box2,
         header="a \t b\t c \t potential_energy \t pressure \t num_molecules \t rho_molecules_per_nm3 \t timestep \t volume \t density \t temperature \t kinetic_energy",
     )
@@ -410,151 +554,169 @@ def system_equilibrated(job):
         is_equilibrated,
     )
 
+    sp = _statepoint(job)
     # If a system is already equilibrated, we don't want to check equilibration again, so read information from the file and return True if equilibrated.
     if job.doc.get("is_equilibrated") == True:
         with open(job.ws + "/equil_information.txt", "r") as f:
             print(f.read())
         return True
 
-    with job:
-        files = glob("fort*12*{}*".format("equil"))
+    files = glob(os.path.join(job.ws, "fort*12*{}*".format("equil")))
 
-        if len(files) < 2:  # at least do two loops of equilibration
+    if len(files) < 2:  # at least do two loops of equilibration
 
-            print(
-                "equils done is less than 2 for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa.".format(
-                    job,
-                    job.sp.molecule,
-                    job.sp.ensemble,
-                    job.sp.temperature,
-                    job.sp.pressure,
-                )
+        print(
+            "equils done is less than 2 for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa.".format(
+                job,
+                sp["molecule"],
+                sp["ensemble"],
+                sp["temperature"],
+                sp["pressure"],
             )
-            return False
+        )
+        return False
 
-        if job.sp.ensemble == "NPT":
-            equil_log = sanitize_npt_log("equil", job)
-            # Now run pymbar on box length and box energy
-            equil_status_density = is_equilibrated(
-                equil_log[:, 6], threshold_fraction=0.2, nskip=100
-            )
-            equil_status_energy = is_equilibrated(
-                equil_log[:, 3], threshold_fraction=0.2, nskip=100
+    if sp["ensemble"] == "NPT":
+        equil_log = sanitize_npt_log("equil", job)
+        # Now run pymbar on box length and box energy
+        equil_status_density = is_equilibrated(
+            equil_log[:, 6], threshold_fraction=0.2, nskip=100
+        )
+        equil_status_energy = is_equilibrated(
+            equil_log[:, 3], threshold_fraction=0.2, nskip=100
+        )
+        if (equil_status_density[0] and equil_status_energy[0]) == False:
+            print(
+                "System {} is not equilibrated. Completed {} equil loops".format(
+                    job, job.doc.get("equil_replicates_done")
+                )
             )
-            if (equil_status_density[0] and equil_status_energy[0]) == False:
+            print("Equil status density1={}".format(equil_status_density))
+            print("Equil status energy1={}".format(equil_status_energy))
+            if len(files) >= 3:
                 print(
-                    "System {} is not equilibrated. Completed {} equil loops".format(
-                        job, job.doc.get("equil_replicates_done")
+                    "Even though the {} system is not equilibrated according to pymbar, we are considering this system equilibrated as 3 equil loops are completed".format(
+                        job
                     )
                 )
-                print("Equil status density1={}".format(equil_status_density))
-                print("Equil status energy1={}".format(equil_status_energy))
-                if len(files) >= 3:
-                    print(
+                with open(
+                    os.path.join(job.ws, "equil_information.txt"), "w"
+                ) as text_file:
+                    n = text_file.write(
                         "Even though the {} system is not equilibrated according to pymbar, we are considering this system equilibrated as 3 equil loops are completed".format(
                             job
                         )
                     )
-                    with open("equil_information.txt", "w") as text_file:
-                        n = text_file.write(
-                            "Even though the {} system is not equilibrated according to pymbar, we are considering this system equilibrated as 3 equil loops are completed".format(
-                                job
-                            )
-                        )
-                    text_file.close()
+                text_file.close()
 
-                    job.doc.is_equilibrated = True
-                    return True
-                return False
-            if (equil_status_density[0] and equil_status_energy[0]) == True:
-                print(
+                job.doc.is_equilibrated = True
+                return True
+            return False
+        if (equil_status_density[0] and equil_status_energy[0]) == True:
+            print(
+                "System {} is equilibrated at cycle {}. Completed {} equil loops".format(
+                    job,
+                    max(equil_status_density[1], equil_status_energy[1]),
+                    job.doc.get("equil_replicates_done"),
+                )
+            )
+            with open(
+                os.path.join(job.ws, "equil_information.txt"), "w"
+            ) as text_file:
+                n = text_file.write(
                     "System {} is equilibrated at cycle {}. Completed {} equil loops".format(
                         job,
                         max(equil_status_density[1], equil_status_energy[1]),
                         job.doc.get("equil_replicates_done"),
                     )
                 )
-                with open("equil_information.txt", "w") as text_file:
-                    n = text_file.write(
-                        "System {} is equilibrated at cycle {}. Completed {} equil loops".format(
-                            job,
-                            max(
-                                equil_status_density[1], equil_status_energy[1]
-                            ),
-                            job.doc.get("equil_replicates_done"),
-                        )
-                    )
-                text_file.close()
-                job.doc.is_equilibrated = True
-                return True
-
-        if job.sp.ensemble == "GEMC-NVT":
-            print("Checking eqlb for GEMC-NVT")
-            equil_log_box1 = sanitize_gemc_log("equil", job)[0]
-            equil_log_box2 = sanitize_gemc_log("equil", job)[1]
-            equil_status_density1 = is_equilibrated(
-                equil_log_box1[:, 6], threshold_fraction=0.2, nskip=100
-            )
-            equil_status_energy1 = is_equilibrated(
-                equil_log_box1[:, 3], threshold_fraction=0.2, nskip=100
-            )
-            equil_status_density2 = is_equilibrated(
-                equil_log_box2[:, 6], threshold_fraction=0.2, nskip=100
-            )
-            equil_status_energy2 = is_equilibrated(
-                equil_log_box2[:, 3], threshold_fraction=0.2, nskip=100
+            text_file.close()
+            job.doc.is_equilibrated = True
+            return True
+
+    if sp["ensemble"] == "GEMC-NVT":
+        print("Checking eqlb for GEMC-NVT")
+        equil_log_box1 = sanitize_gemc_log("equil", job)[0]
+        equil_log_box2 = sanitize_gemc_log("equil", job)[1]
+        equil_status_density1 = is_equilibrated(
+            equil_log_box1[:, 6], threshold_fraction=0.2, nskip=100
+        )
+        equil_status_energy1 = is_equilibrated(
+            equil_log_box1[:, 3], threshold_fraction=0.2, nskip=100
+        )
+        equil_status_density2 = is_equilibrated(
+            equil_log_box2[:, 6], threshold_fraction=0.2, nskip=100
+        )
+        equil_status_energy2 = is_equilibrated(
+            equil_log_box2[:, 3], threshold_fraction=0.2, nskip=100
+        )
+        equil_status_total_energy = is_equilibrated(
+            equil_log_box1[:, 3] + equil_log_box2[:, 3],
+            threshold_fraction=0.2,
+            nskip=100,
+        )
+        if (
+            equil_status_density1[0]
+            and equil_status_energy1[0]
+            and equil_status_density2[0]
+            and equil_status_energy2[0]
+            and equil_status_total_energy[0]
+        ) == False:
+            print(
+                "System {} is not equilibrated. Completed {} equil loops".format(
+                    job, job.doc.get("equil_replicates_done")
+                )
             )
-            equil_status_total_energy = is_equilibrated(
-                equil_log_box1[:, 3] + equil_log_box2[:, 3],
-                threshold_fraction=0.2,
-                nskip=100,
+            print("Equil status density1={}".format(equil_status_density1))
+            print("Equil status energy1={}".format(equil_status_energy1))
+            print("Equil status density2={}".format(equil_status_density2))
+            print("Equil status energy2={}".format(equil_status_energy2))
+            print(
+                "Equil status total energy={}".format(equil_status_total_energy)
             )
-            if (
-                equil_status_density1[0]
-                and equil_status_energy1[0]
-                and equil_status_density2[0]
-                and equil_status_energy2[0]
-                and equil_status_total_energy[0]
-            ) == False:
+            if len(files) >= 3:
                 print(
-                    "System {} is not equilibrated. Completed {} equil loops".format(
-                        job, job.doc.get("equil_replicates_done")
+                    "Even though the {} system is not equilibrated according to pymbar, we are considering this system equilibrated as 3 equil loops are completed".format(
+                        job
                     )
                 )
-                print("Equil status density1={}".format(equil_status_density1))
-                print("Equil status energy1={}".format(equil_status_energy1))
-                print("Equil status density2={}".format(equil_status_density2))
-                print("Equil status energy2={}".format(equil_status_energy2))
-                print(
-                    "Equil status total energy={}".format(
-                        equil_status_total_energy
-                    )
-                )
-                if len(files) >= 3:
-                    print(
+                with open(
+                    os.path.join(job.ws, "equil_information.txt"), "w"
+                ) as text_file:
+                    n = text_file.write(
                         "Even though the {} system is not equilibrated according to pymbar, we are considering this system equilibrated as 3 equil loops are completed".format(
                             job
                         )
                     )
-                    with open("equil_information.txt", "w") as text_file:
-                        n = text_file.write(
-                            "Even though the {} system is not equilibrated according to pymbar, we are considering this system equilibrated as 3 equil loops are completed".format(
-                                job
-                            )
-                        )
-                    text_file.close()
-                    job.doc.is_equilibrated = True
-                    return True
-
-                return False
-            if (
-                equil_status_density1[0]
-                and equil_status_energy1[0]
-                and equil_status_density2[0]
-                and equil_status_energy2[0]
-                and equil_status_total_energy[0]
-            ) == True:
-                print(
+                text_file.close()
+                job.doc.is_equilibrated = True
+                return True
+
+            return False
+        if (
+            equil_status_density1[0]
+            and equil_status_energy1[0]
+            and equil_status_density2[0]
+            and equil_status_energy2[0]
+            and equil_status_total_energy[0]
+        ) == True:
+            print(
+                "System {} is equilibrated at cycle {}. Completed {} equil loops".format(
+                    job,
+                    max(
+                        equil_status_density1[1],
+                        equil_status_energy1[1],
+                        equil_status_density2[1],
+                        equil_status_energy2[1],
+                        equil_status_total_energy[1],
+                    ),
+                    job.doc.get("equil_replicates_done"),
+                )
+            )
+            with open(
+                os.path.join(job.ws, "equil_information.txt"), "w"
+            ) as text_file:
+                n = text_file.write(
                     "System {} is equilibrated at cycle {}. Completed {} equil loops".format(
                         job,
                         max(
@@ -567,23 +729,9 @@ def system_equilibrated(job):
                         job.doc.get("equil_replicates_done"),
                     )
                 )
-                with open("equil_information.txt", "w") as text_file:
-                    n = text_file.write(
-                        "System {} is equilibrated at cycle {}. Completed {} equil loops".format(
-                            job,
-                            max(
-                                equil_status_density1[1],
-                                equil_status_energy1[1],
-                                equil_status_density2[1],
-                                equil_status_energy2[1],
-                                equil_status_total_energy[1],
-                            ),
-                            job.doc.get("equil_replicates_done"),
-                        )
-                    )
-                text_file.close()
-                job.doc.is_equilibrated = True
-                return True
+            text_file.close()
+            job.doc.is_equilibrated = True
+            return True
 
 
 @Project.label
@@ -594,36 +742,15 @@ def prod_finished(job):
         step = "prod" + str(job.doc.prod_replicates_done - 1)
     except (KeyError, AttributeError):
         step = "prod" + "0"
-    run_file = job.ws + "/run.{}".format(step)
-    if job.isfile("run.{}".format(step)):
-        with open(run_file) as myfile:
-            return "Program ended" in myfile.read()
-    else:
-        return False
+    return _stage_finished(job, step)
 
 
 """Setting up workflow operation"""
 
 
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
-@Project.post(
-    lambda j: (
-        j.isfile("init1.pdb")
-        and j.isfile("init1.mol2")
-        and j.sp.ensemble == "NPT"
-    )
-    or (
-        (
-            j.isfile("init1.pdb")
-            and j.isfile("init2.pdb")
-            and j.isfile("init1.mol2")
-            and j.isfile("init2.mol2")
-            and j.sp.ensemble == "GEMC-NVT"
-        )
-    )
-)
-@flow.with_job
+@Project.pre(is_mcccs)
+@Project.post(save_top_done)
 def save_top(job):
     """Save topology files for the two boxes."""
     print("Saving topology file.")
@@ -634,14 +761,14 @@ def save_top(job):
 
     # Create a Compound and save to pdb
     system = construct_system(job.sp)
-    ff = load_ff(job.sp.forcefield_name)
+    ff = load_ff(_statepoint(job)["forcefield_name"])
     param_system = ff.apply(system[0])
     param_system.save(
-        "init1.pdb",
+        os.path.join(job.ws, "init1.pdb"),
         overwrite=True,
     )
     param_system.save(
-        "init1.mol2",
+        os.path.join(job.ws, "init1.mol2"),
         overwrite=True,
     )
 
@@ -649,17 +776,17 @@ def save_top(job):
         return
     param_system = ff.apply(system[1])
     param_system.save(
-        "init2.pdb",
+        os.path.join(job.ws, "init2.pdb"),
         overwrite=True,
     )
     param_system.save(
-        "init2.mol2",
+        os.path.join(job.ws, "init2.mol2"),
         overwrite=True,
     )
 
 
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.post(equil_replicate_set)
 def set_equil_replicates(job):
     """Copy the files for simulation from engine_input folder."""
@@ -668,90 +795,148 @@ def set_equil_replicates(job):
 
 
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.post(replicate_set)
 def set_prod_replicates(job):
     """Copy the files for simulation from engine_input folder."""
     print("prod replicates set for job {}".format(job))
-    job.doc.num_prod_replicates = 4
-    job.doc.prod_replicates_done = 0
+    # Set both keys in a single write of the job document.
+    job.doc.update({"num_prod_replicates": 4, "prod_replicates_done": 0})
+
+
+def _link_or_copy(src, dst):
+    """Hard link src to dst, replacing dst, or copy if linking is not possible."""
+    tmp = dst + ".tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _replace_text(file_name, text):
+    """Write text to a new file and rename it over file_name.
+
+    Workspace inputs may be hard links to the files in engine_input, so they
+    must never be modified in place.
+    """
+    # A stale temporary file may itself be a hard link, so never reopen it.
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(file_name + ".tmp")
+    with open(file_name + ".tmp", "w") as fout:
+        fout.write(text)
+    # Keep the mode the file had when it was rewritten in place.
+    shutil.copymode(file_name, file_name + ".tmp")
+    os.replace(file_name + ".tmp", file_name)
 
 
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.post(has_fort_files)
 def copy_files(job):
-    """Copy the files for simulation from engine_input folder."""
+    """Copy the files for simulation from engine_input folder.
+
+    The files are hard linked where possible, as they are only replaced and
+    never modified in place.
+    """
+    sp = _statepoint(job)
     print("Copying files from the root directory to workspace.")
-    for file in glob(
-        Project().root_directory()
-        + "/src/engine_input/mcccs/{}/{}/fort.4.*".format(
-            job.sp.molecule, job.sp.ensemble
-        )
-    ):
-        shutil.copy(file, job.workspace() + "/")
+    with os.scandir(_engine_input_dir(sp["molecule"], sp["ensemble"])) as it:
+        for entry in it:
+            if entry.name.startswith("fort.4.") and entry.is_file():
+                _link_or_copy(entry.path, job.ws + "/" + entry.name)
 
 
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.post(has_topmon)
 def copy_topmon(job):
     """Copy topmon.inp from root directory to mcccs directory."""
+    sp = _statepoint(job)
     print("Copying topmon.")
-    shutil.copy(
-        Project().root_directory()
-        + "/src/engine_input/mcccs/{}/{}/topmon.inp".format(
-            job.sp.molecule, job.sp.ensemble
-        ),
-        job.workspace() + "/",
+    _link_or_copy(
+        _engine_input_dir(sp["molecule"], sp["ensemble"]) + "/topmon.inp",
+        job.ws + "/topmon.inp",
     )
 
 
+def _keyword_pattern(keywords, variables):
+    """Return a regex matching any keyword and the keyword to value mapping."""
+    mapping = dict(zip(keywords, map(str, variables)))
+    # Longest first so that no keyword can shadow another it is a prefix of.
+    pattern = re.compile(
+        "|".join(map(re.escape, sorted(mapping, key=len, reverse=True)))
+    )
+    return pattern, mapping
+
+
+def _replace_keywords(file_name, pattern, mapping):
+    """Replace all keywords in a file in a single read and write."""
+    text = pathlib.Path(file_name).read_text()
+    _replace_text(file_name, pattern.sub(lambda m: mapping[m.group(0)], text))
+
+
+def _replace_keywords_fort_files(job, file_names, keywords, variables):
+    """Replace the keywords in the fort.4 files of the job concurrently.
+
+    The rewrites are small and I/O bound, so threads are enough to overlap
+    the file system latency of the independent files.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pattern, mapping = _keyword_pattern(keywords, variables)
+    fort_files = [job.ws + "/fort.4." + name for name in file_names]
+    with ThreadPoolExecutor(max_workers=len(fort_files)) as executor:
+        # Consume the results so that errors from the workers are raised.
+        replace = functools.partial(
+            _replace_keywords, pattern=pattern, mapping=mapping
+        )
+        list(executor.map(replace, fort_files))
+
+
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs" and j.sp.ensemble == "NPT")
+@Project.pre(is_mcccs_npt)
 @Project.pre(has_fort_files)
 @Project.post(files_ready)
 def replace_keyword_fort_files_npt(job):
     """Replace keywords with the values of the variables defined in signac statepoint."""
+    sp = _statepoint(job)
     print("Replacing keywords in fort files.")
     file_names = ["melt", "cool", "equil", "prod"]
-    seed = job.sp.replica
-    nchain = job.sp.N_liquid
-    length = job.sp.box_L_liq * 10  # nm to A
-    temperature = job.sp.temperature
-    pressure = job.sp.pressure / 1000  # kPa to MPa
-    rcut = job.sp.r_cut * 10
+    seed = sp["replica"]
+    nchain = sp["N_liquid"]
+    length = sp["box_L_liq"] * 10  # nm to A
+    temperature = sp["temperature"]
+    pressure = sp["pressure"] / 1000  # kPa to MPa
+    rcut = sp["r_cut"] * 10
     variables = [nchain, length, temperature, pressure, seed, rcut]
     keywords = ["NCHAIN", "LENGTH", "TEMPERATURE", "PRESSURE", "SEED", "RCUT"]
-    for name in file_names:
-        file_name = job.ws + "/fort.4." + name
-        i = 0
-        for i in range(len(variables)):
-            with fileinput.FileInput(file_name, inplace=True) as file:
-                for line in file:
-                    print(line.replace(keywords[i], str(variables[i])), end="")
+    _replace_keywords_fort_files(job, file_names, keywords, variables)
 
 
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs" and j.sp.ensemble == "GEMC-NVT")
+@Project.pre(is_mcccs_gemc)
 @Project.pre(has_fort_files)
 @Project.post(files_ready)
 def replace_keyword_fort_files_gemc(job):
     """Replace keywords with the values of the variables defined in signac statepoint."""
+    sp = _statepoint(job)
     print("Replacing keywords in fort files.")
     file_names = ["melt", "cool", "equil", "prod"]
-    seed = job.sp.replica
-    nchain1 = job.sp.N_liquid
-    length1 = job.sp.box_L_liq * 10  # nm to A
-    nchain2 = job.sp.N_vap
-    length2 = job.sp.box_L_vap * 10  # nm to A
-    temperature = job.sp.temperature
-    pressure = job.sp.pressure / 1000  # kPa to MPa
-    rcut = job.sp.r_cut * 10
+    seed = sp["replica"]
+    nchain1 = sp["N_liquid"]
+    length1 = sp["box_L_liq"] * 10  # nm to A
+    nchain2 = sp["N_vap"]
+    length2 = sp["box_L_vap"] * 10  # nm to A
+    temperature = sp["temperature"]
+    pressure = sp["pressure"] / 1000  # kPa to MPa
+    rcut = sp["r_cut"] * 10
     nchaintot = nchain1 + nchain2
     inix1 = 1 + math.ceil(nchain1 ** 0.33)
     iniy1 = 1 + math.ceil(nchain1 ** 0.33)
@@ -793,30 +978,25 @@ def replace_keyword_fort_files_gemc(job):
         "INIY2",
         "INIZ2",
     ]
-    for name in file_names:
-        file_name = job.ws + "/fort.4." + name
-        i = 0
-        for i in range(len(variables)):
-            with fileinput.FileInput(file_name, inplace=True) as file:
-                for line in file:
-                    print(line.replace(keywords[i], str(variables[i])), end="")
+    _replace_keywords_fort_files(job, file_names, keywords, variables)
 
 
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(has_topmon)
 @Project.post(topmon_ready)
 def replace_lrc_shift_topmon(job):
     """Replace ltailc and lshift in topmon."""
+    sp = _statepoint(job)
     print("Replacing lrc and shift boolean in topmon.")
     file_name = job.ws + "/topmon.inp"
-    if not job.isfile(file_name):
+    if not _ws_has(job, "topmon.inp"):
         return
     # default ltailc and lshift are F
-    if job.sp.cutoff_style == "shift":
+    if sp["cutoff_style"] == "shift":
         make_lshift_T(file_name)
-    if job.sp.long_range_correction == "energy_pressure":
+    if sp["long_range_correction"] == "energy_pressure":
         make_ltailc_T(file_name)
 
 
@@ -833,10 +1013,7 @@ def make_ltailc_T(filename):
             replacement = replacement + line
 
     file.close()
-    # opening the file in write mode
-    fout = open(filename, "w")
-    fout.write(replacement)
-    fout.close()
+    _replace_text(filename, replacement)
 
 
 def make_lshift_T(filename):
@@ -852,15 +1029,12 @@ def make_lshift_T(filename):
             replacement = replacement + line
 
     file.close()
-    # opening the file in write mode
-    fout = open(filename, "w")
-    fout.write(replacement)
-    fout.close()
+    _replace_text(filename, replacement)
 
 
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.post(has_restart_file)
 def make_restart_file(job):
     """Make a restart file for the job using fort77maker."""
@@ -870,10 +1044,11 @@ def make_restart_file(job):
         get_molecule,
     )
 
+    sp = _statepoint(job)
     molecules = [get_molecule(job.sp)]
     system = construct_system(job.sp, constrain=True)
     """Make a fort77 file for the job."""
-    if job.sp.ensemble == "GEMC-NVT":
+    if sp["ensemble"] == "GEMC-NVT":
         #        from fort77maker_twobox import fort77writer
         from reproducibility_project.src.engine_input.mcccs.fort77maker_twobox import (
             fort77writer,
@@ -891,7 +1066,7 @@ def make_restart_file(job):
         )
 
         return
-    elif job.sp.ensemble == "NPT":
+    elif sp["ensemble"] == "NPT":
         # from fort77maker_onebox import fort77writer
         from reproducibility_project.src.engine_input.mcccs.fort77maker_onebox import (
             fort77writer,
@@ -908,9 +1083,67 @@ def make_restart_file(job):
         return
 
 
+# (MCCCS-MN output, archived name) pairs, formatted with the step name.
+_STAGE_OUTPUTS = (
+    ("fort.12", "fort.12.{}"),
+    ("box1config1a.xyz", "box1config1a.xyz.{}"),
+    ("run1a.dat", "run.{}"),
+    ("config1a.dat", "config1a.dat.{}"),
+    ("box1movie1a.pdb", "box1movie1a.{}.pdb"),
+    ("box1movie1a.xyz", "box1movie1a.{}.xyz"),
+)
+_GEMC_STAGE_OUTPUTS = (
+    ("box2movie1a.pdb", "box2movie1a.{}.pdb"),
+    ("box2movie1a.xyz", "box2movie1a.{}.xyz"),
+)
+
+
+def _run_stage(job, step, fort4, gemc_movies=False):
+    """Run MCCCS-MN with fort.4.<fort4> and archive the outputs of the step.
+
+    The console output of MCCCS-MN is written to stdout.<step> and the final
+    configuration of the step becomes the fort.77 restart file of the next
+    one. With gemc_movies the box 2 movie files of GEMC-NVT
+    simulations are archived as well.
+    """
+    import subprocess
+
+    sp = _statepoint(job)
+    outputs = _STAGE_OUTPUTS
+    if gemc_movies and sp["ensemble"] == "GEMC-NVT":
+        outputs += _GEMC_STAGE_OUTPUTS
+    ws = job.ws
+    # MCCCS-MN only reads fort.4, so point it at the stage input instead of
+    # copying it. The relative link keeps working if the workspace moves.
+    fort4_path = os.path.join(ws, "fort.4")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(fort4_path)
+    try:
+        os.symlink("fort.4.{}".format(fort4), fort4_path)
+    except OSError:
+        _link_or_copy(os.path.join(ws, "fort.4.{}".format(fort4)), fort4_path)
+    with open(os.path.join(ws, "stdout.{}".format(step)), "w") as stdout:
+        # Run the executable directly in the workspace, without a shell and
+        # without changing the working directory of this process.
+        subprocess.run(
+            [mc3s_exec()],
+            cwd=ws,
+            stdin=subprocess.DEVNULL,
+            stdout=stdout,
+            stderr=subprocess.STDOUT,
+            check=True,
+        )
+    for src, dst in outputs:
+        os.replace(os.path.join(ws, src), os.path.join(ws, dst.format(step)))
+    _link_or_copy(
+        os.path.join(ws, "config1a.dat.{}".format(step)),
+        os.path.join(ws, "fort.77"),
+    )
+
+
 @ex
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(has_restart_file)
 @Project.pre(has_fort_files)
 @Project.pre(has_topmon)
@@ -919,175 +1152,79 @@ def make_restart_file(job):
 @Project.post(melt_finished)
 def run_melt(job):
     """Run melting stage."""
-    from subprocess import PIPE, Popen
-
     step = "melt"
-    """Run the melting stage."""
     print_running_string(job, step)
-    execommand = mc3s_exec()
-    with job:
-        shutil.copyfile("fort.4.{}".format(step), "fort.4")
-        process = Popen(
-            execommand,
-            shell=True,
-            universal_newlines=True,
-            stdin=PIPE,
-            stdout=PIPE,
-            stderr=PIPE,
-        )
-        output, error = process.communicate()
-        print(output)
-        shutil.move("fort.12", "fort.12.{}".format(step))
-        shutil.move("box1config1a.xyz", "box1config1a.xyz.{}".format(step))
-        shutil.move("run1a.dat", "run.{}".format(step))
-        shutil.copy("config1a.dat", "fort.77")
-        shutil.move("config1a.dat", "config1a.dat.{}".format(step))
-        shutil.move("box1movie1a.pdb", "box1movie1a.{}.pdb".format(step))
-        shutil.move("box1movie1a.xyz", "box1movie1a.{}.xyz".format(step))
-        print_completed_string(job, step)
+    _run_stage(job, step, "melt")
+    print_completed_string(job, step)
 
 
 @Project.operation
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(has_restart_file)
 @Project.pre(melt_finished)
 @Project.post(cool_finished)
 def run_cool(job):
     """Run cool stage."""
-    from subprocess import PIPE, Popen
-
     step = "cool"
-    """Run the melting stage."""
     print_running_string(job, step)
-    execommand = mc3s_exec()
-    with job:
-
-        shutil.copyfile("fort.4.{}".format(step), "fort.4")
-        process = Popen(
-            execommand,
-            shell=True,
-            universal_newlines=True,
-            stdin=PIPE,
-            stdout=PIPE,
-            stderr=PIPE,
-        )
-        output, error = process.communicate()
-        print(output)
-        shutil.move("fort.12", "fort.12.{}".format(step))
-        shutil.move("box1config1a.xyz", "box1config1a.xyz.{}".format(step))
-        shutil.move("run1a.dat", "run.{}".format(step))
-        shutil.copy("config1a.dat", "fort.77")
-        shutil.move("config1a.dat", "config1a.dat.{}".format(step))
-        shutil.move("box1movie1a.pdb", "box1movie1a.{}.pdb".format(step))
-        shutil.move("box1movie1a.xyz", "box1movie1a.{}.xyz".format(step))
+    _run_stage(job, step, "cool")
     print_completed_string(job, step)
 
 
 @Project.operation.with_directives({"walltime": 200})
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(has_restart_file)
 @Project.pre(cool_finished)
 @Project.post(equil_finished)
 @Project.post(system_equilibrated)
 def run_equil(job):
     """Run equilibration."""
-    from subprocess import PIPE, Popen
-
     step = "equil" + str(job.doc.equil_replicates_done)
-    """Run the  equil  stage."""
     print_running_string(job, step)
-    execommand = mc3s_exec()
-    with job:
-        shutil.copyfile("fort.4.equil", "fort.4")
-        process = Popen(
-            execommand,
-            shell=True,
-            universal_newlines=True,
-            stdin=PIPE,
-            stdout=PIPE,
-            stderr=PIPE,
-        )
-        output, error = process.communicate()
-        print(output)
-        shutil.move("fort.12", "fort.12.{}".format(step))
-        shutil.move("box1config1a.xyz", "box1config1a.xyz.{}".format(step))
-        shutil.move("run1a.dat", "run.{}".format(step))
-        shutil.copy("config1a.dat", "fort.77")
-        shutil.move("config1a.dat", "config1a.dat.{}".format(step))
-        shutil.move("box1movie1a.pdb", "box1movie1a.{}.pdb".format(step))
-        shutil.move("box1movie1a.xyz", "box1movie1a.{}.xyz".format(step))
-        if job.sp.ensemble == "GEMC-NVT":
-            shutil.move("box2movie1a.pdb", "box1movie1a.{}.pdb".format(step))
-            shutil.move("box2movie1a.xyz", "box1movie1a.{}.xyz".format(step))
-        job.doc.equil_replicates_done += 1
+    _run_stage(job, step, "equil", gemc_movies=True)
+    job.doc.equil_replicates_done += 1
     print_completed_string(job, step)
 
 
 @Project.operation.with_directives({"walltime": 200})
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(has_restart_file)
 @Project.pre(system_equilibrated)
 @Project.post(prod_finished)
 @Project.post(all_prod_replicates_done)
 def run_prod(job):
     """Run production."""
-    from subprocess import PIPE, Popen
-
+    sp = _statepoint(job)
     replicate = job.doc.prod_replicates_done
     step = "prod" + str(replicate)
-    """Run the prod stage."""
     print_running_string(job, step)
-    execommand = mc3s_exec()
-    with job:
-        shutil.copyfile("fort.4.prod", "fort.4")
-        process = Popen(
-            execommand,
-            shell=True,
-            universal_newlines=True,
-            stdin=PIPE,
-            stdout=PIPE,
-            stderr=PIPE,
+    _run_stage(job, step, "prod", gemc_movies=True)
+    job.doc.prod_replicates_done += 1
+    print_completed_string(job, step)
+    if all_prod_replicates_done(job):
+        print(
+            "All prod replicates done. Simulation finished for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa.".format(
+                job,
+                sp["molecule"],
+                sp["ensemble"],
+                sp["temperature"],
+                sp["pressure"],
+            )
         )
-        output, error = process.communicate()
-        print(output)
-        shutil.move("fort.12", "fort.12.{}".format(step))
-        shutil.move("box1config1a.xyz", "box1config1a.xyz.{}".format(step))
-        shutil.move("run1a.dat", "run.{}".format(step))
-        shutil.copy("config1a.dat", "fort.77")
-        shutil.move("config1a.dat", "config1a.dat.{}".format(step))
-        shutil.move("box1movie1a.pdb", "box1movie1a.{}.pdb".format(step))
-        shutil.move("box1movie1a.xyz", "box1movie1a.{}.xyz".format(step))
-        if job.sp.ensemble == "GEMC-NVT":
-            shutil.move("box2movie1a.pdb", "box1movie1a.{}.pdb".format(step))
-            shutil.move("box2movie1a.xyz", "box1movie1a.{}.xyz".format(step))
-
-        job.doc.prod_replicates_done += 1
-        print_completed_string(job, step)
-        if all_prod_replicates_done(job):
-            print(
+        with open(job.ws + "/production_information.txt", "w") as text_file:
+            prod_file = text_file.write(
                 "All prod replicates done. Simulation finished for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa.".format(
                     job,
-                    job.sp.molecule,
-                    job.sp.ensemble,
-                    job.sp.temperature,
-                    job.sp.pressure,
+                    sp["molecule"],
+                    sp["ensemble"],
+                    sp["temperature"],
+                    sp["pressure"],
                 )
             )
-            with open("production_information.txt", "w") as text_file:
-                prod_file = text_file.write(
-                    "All prod replicates done. Simulation finished for {} molecule = {}, ensemble = {}, temperature= {} K, pressure = {} kPa.".format(
-                        job,
-                        job.sp.molecule,
-                        job.sp.ensemble,
-                        job.sp.temperature,
-                        job.sp.pressure,
-                    )
-                )
-            text_file.close()
 
 
 @Project.operation.with_directives({"walltime": 200})
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(prod_finished)
 @Project.pre(all_prod_replicates_done)
 @Project.post(log_exists)
@@ -1095,20 +1232,29 @@ def convert_to_txt(job):
     """Make txt log file for the job."""
     import os
 
-    with job:
-        if job.sp.ensemble == "GEMC-NVT":
-            prod_log_box1 = sanitize_gemc_log("prod", job)[0]
-            prod_log_box2 = sanitize_gemc_log("prod", job)[1]
-            os.rename("prod_log_box1.txt", "log-liquid.txt")
-            os.rename("prod_log_box2.txt", "log-vapor.txt")
+    sp = _statepoint(job)
+    if sp["ensemble"] == "GEMC-NVT":
+        prod_log_box1 = sanitize_gemc_log("prod", job)[0]
+        prod_log_box2 = sanitize_gemc_log("prod", job)[1]
+        os.rename(
+            os.path.join(job.ws, "prod_log_box1.txt"),
+            os.path.join(job.ws, "log-liquid.txt"),
+        )
+        os.rename(
+            os.path.join(job.ws, "prod_log_box2.txt"),
+            os.path.join(job.ws, "log-vapor.txt"),
+        )
 
-        elif job.sp.ensemble == "NPT":
-            prod_log = sanitize_npt_log("prod", job)
-            os.rename("prod_log.txt", "log-npt.txt")
+    elif sp["ensemble"] == "NPT":
+        prod_log = sanitize_npt_log("prod", job)
+        os.rename(
+            os.path.join(job.ws, "prod_log.txt"),
+            os.path.join(job.ws, "log-npt.txt"),
+        )
 
 
 @Project.operation.with_directives({"walltime": 200})
-@Project.pre(lambda j: j.sp.engine == "mcccs")
+@Project.pre(is_mcccs)
 @Project.pre(prod_finished)
 @Project.pre(all_prod_replicates_done)
 @Project.post(traj_exists)
@@ -1119,89 +1265,89 @@ def convert_to_gsd(job):
     import mdtraj as md
     import numpy as np
 
-    with job:
-        if job.sp.ensemble == "GEMC-NVT":
-            traj_list = []
-            traj_files = sorted(glob("box1movie1a*prod*xyz*"))
-            print(traj_files)
-            prod_number = 0
-            for filename in traj_files:
-                print(
-                    "The filename is {} and the prod number is {}. These two should match.".format(
-                        filename, prod_number
-                    )
-                )
-                traj = md.load(filename, top="init1.mol2")
-                fort12_filename = "fort.12.prod{}".format(prod_number)
-                fort12 = np.genfromtxt(fort12_filename, skip_header=1)
-                traj = md.Trajectory(
-                    traj.xyz,
-                    traj.top,
-                    unitcell_lengths=fort12[19::20, 0:3] / 10,
-                    unitcell_angles=np.tile(
-                        [90.0, 90.0, 90.0], (traj.n_frames, 1)
-                    ),
-                )
-                traj_list.append(traj)
-                print("one traj loaded")
-                prod_number += 1
-            comb_traj = md.join(traj_list)
-            comb_traj.save_gsd("trajectory-liquid.gsd")
-
-            traj_list = []
-            traj_files = sorted(glob("box2movie1a*prod*xyz*"))
-            print(traj_files)
-            prod_number = 0
-            for filename in traj_files:
-                print(
-                    "The filename is {} and the prod number is {}. These two should match.".format(
-                        filename, prod_number
-                    )
-                )
-                traj = md.load(filename, top="init1.mol2")
-                fort12_filename = "fort.12.prod{}".format(prod_number)
-                fort12 = np.genfromtxt(fort12_filename, skip_header=1)
-                traj = md.Trajectory(
-                    traj.xyz,
-                    traj.top,
-                    unitcell_lengths=fort12[20::20, 0:3] / 10,
-                    unitcell_angles=np.tile(
-                        [90.0, 90.0, 90.0], (traj.n_frames, 1)
-                    ),
+    sp = _statepoint(job)
+    if sp["ensemble"] == "GEMC-NVT":
+        traj_list = []
+        traj_files = sorted(glob(os.path.join(job.ws, "box1movie1a*prod*xyz*")))
+        print(traj_files)
+        prod_number = 0
+        for filename in traj_files:
+            print(
+                "The filename is {} and the prod number is {}. These two should match.".format(
+                    filename, prod_number
                 )
-                traj_list.append(traj)
-                print("one traj loaded")
-                prod_number += 1
-            comb_traj = md.join(traj_list)
-            comb_traj.save_gsd("trajectory-vapor.gsd")
-
-        elif job.sp.ensemble == "NPT":
-            traj_list = []
-            traj_files = sorted(glob("box1movie1a*prod*xyz*"))
-            print(traj_files)
-            prod_number = 0
-            for filename in traj_files:
-                print(
-                    "The filename is {} and the prod number is {}. These two should match.".format(
-                        filename, prod_number
-                    )
+            )
+            traj = md.load(filename, top=os.path.join(job.ws, "init1.mol2"))
+            fort12_filename = os.path.join(
+                job.ws, "fort.12.prod{}".format(prod_number)
+            )
+            fort12 = np.genfromtxt(fort12_filename, skip_header=1)
+            traj = md.Trajectory(
+                traj.xyz,
+                traj.top,
+                unitcell_lengths=fort12[19::20, 0:3] / 10,
+                unitcell_angles=np.tile([90.0, 90.0, 90.0], (traj.n_frames, 1)),
+            )
+            traj_list.append(traj)
+            print("one traj loaded")
+            prod_number += 1
+        comb_traj = md.join(traj_list)
+        comb_traj.save_gsd(os.path.join(job.ws, "trajectory-liquid.gsd"))
+
+        traj_list = []
+        traj_files = sorted(glob(os.path.join(job.ws, "box2movie1a*prod*xyz*")))
+        print(traj_files)
+        prod_number = 0
+        for filename in traj_files:
+            print(
+                "The filename is {} and the prod number is {}. These two should match.".format(
+                    filename, prod_number
                 )
-                traj = md.load(filename, top="init1.mol2")
-                fort12_filename = "fort.12.prod{}".format(prod_number)
-                fort12 = np.genfromtxt(fort12_filename, skip_header=1)
-                traj = md.Trajectory(
-                    traj.xyz,
-                    traj.top,
-                    unitcell_lengths=fort12[9::10, 0:3] / 10,
-                    unitcell_angles=np.tile(
-                        [90.0, 90.0, 90.0], (traj.n_frames, 1)
-                    ),
+            )
+            traj = md.load(filename, top=os.path.join(job.ws, "init1.mol2"))
+            fort12_filename = os.path.join(
+                job.ws, "fort.12.prod{}".format(prod_number)
+            )
+            fort12 = np.genfromtxt(fort12_filename, skip_header=1)
+            traj = md.Trajectory(
+                traj.xyz,
+                traj.top,
+                unitcell_lengths=fort12[20::20, 0:3] / 10,
+                unitcell_angles=np.tile([90.0, 90.0, 90.0], (traj.n_frames, 1)),
+            )
+            traj_list.append(traj)
+            print("one traj loaded")
+            prod_number += 1
+        comb_traj = md.join(traj_list)
+        comb_traj.save_gsd(os.path.join(job.ws, "trajectory-vapor.gsd"))
+
+    elif sp["ensemble"] == "NPT":
+        traj_list = []
+        traj_files = sorted(glob(os.path.join(job.ws, "box1movie1a*prod*xyz*")))
+        print(traj_files)
+        prod_number = 0
+        for filename in traj_files:
+            print(
+                "The filename is {} and the prod number is {}. These two should match.".format(
+                    filename, prod_number
                 )
-                traj_list.append(traj)
-                print("one traj loaded")
-                prod_number += 1
-            comb_traj = md.join(traj_list)
-            comb_traj.save_gsd("trajectory-npt.gsd")
+            )
+            traj = md.load(filename, top=os.path.join(job.ws, "init1.mol2"))
+            fort12_filename = os.path.join(
+                job.ws, "fort.12.prod{}".format(prod_number)
+            )
+            fort12 = np.genfromtxt(fort12_filename, skip_header=1)
+            traj = md.Trajectory(
+                traj.xyz,
+                traj.top,
+                unitcell_lengths=fort12[9::10, 0:3] / 10,
+                unitcell_angles=np.tile([90.0, 90.0, 90.0], (traj.n_frames, 1)),
+            )
+            traj_list.append(traj)
+            print("one traj loaded")
+            prod_number += 1
+        comb_traj = md.join(traj_list)
+        comb_traj.save_gsd(os.path.join(job.ws, "trajectory-npt.gsd"))
 
 
 if __name__ == "__main__":
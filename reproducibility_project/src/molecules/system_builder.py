@@ -90,11 +90,18 @@ def construct_system(
     for box in boxes:
         if box is None:
             continue
-        else:
-            for mol in box.children:
-                constrain_mol.update_xyz(mol.xyz * 10)  # nm to angstrom
-                constrain_mol.solve()
-                mol.xyz = constrain_mol.xyz / 10.0  # angstrom to nm
+        if box.n_particles != len(box.children) * molecule.n_particles:
+            raise ValueError(
+                f"Expected {len(box.children)} molecules of {molecule.n_particles} particles in the box, found {box.n_particles} particles."
+            )
+        # Gather the coordinates of all molecules once as (n_mol, n_atom, 3),
+        # solve each molecule in place and write the box back in one go.
+        xyz = box.xyz.reshape(len(box.children), -1, 3) * 10  # nm to angstrom
+        for mol_xyz in xyz:
+            constrain_mol.update_xyz(mol_xyz)
+            constrain_mol.solve()
+            mol_xyz[:] = constrain_mol.xyz
+        box.xyz = xyz.reshape(-1, 3) / 10.0  # angstrom to nm
 
     return boxes
 
@@ -130,14 +137,15 @@ def get_molecule(sp):
         Return mBuild molecule for the statepoint.
     """
     molecule_dict = {
-        "methaneUA": MethaneUA(),
-        "pentaneUA-flexible_bonds": PentaneUA(),
-        "pentaneUA-constrain_bonds": PentaneUA(),
-        "pentaneUA": PentaneUA(),
-        "benzeneUA": BenzeneUA(),
-        "waterSPCE": WaterSPC(),
-        "ethanolAA": EthanolAA(),
+        "methaneUA": MethaneUA,
+        "pentaneUA-flexible_bonds": PentaneUA,
+        "pentaneUA-constrain_bonds": PentaneUA,
+        "pentaneUA": PentaneUA,
+        "benzeneUA": BenzeneUA,
+        "waterSPCE": WaterSPC,
+        "ethanolAA": EthanolAA,
     }
-    molecule = molecule_dict[sp["molecule"]]
+    # Only build the requested molecule, not every supported one.
+    molecule = molecule_dict[sp["molecule"]]()
     molecule.name = sp["molecule"]
     return molecule
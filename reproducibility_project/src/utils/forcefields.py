@@ -1,9 +1,11 @@
 """Utilities to load forcefields based on forcefield names."""
+import functools
 import os
 
 import foyer
 
 
+@functools.lru_cache(maxsize=None)
 def load_ff(
     name: str = None,
 ) -> foyer.Forcefield:
@@ -11,6 +13,7 @@ def load_ff(
 
     For the reproducibility project, multiple forcefield types are expected based on the molecule of study at that statepoint.
     This will return a foyer.Forcefield object based on a naming convention defined in the init.py within the reproducibility_project.
+    Parsing the forcefield XML is expensive, so the object is loaded once per name and shared by all later calls.
 
     Parameters
     ----------
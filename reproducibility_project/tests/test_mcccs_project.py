@@ -0,0 +1,143 @@
+import os
+from types import SimpleNamespace
+
+from reproducibility_project.src.engines.mcccs import project
+from reproducibility_project.src.engines.mcccs.project import (
+    _keyword_pattern,
+    _replace_keywords,
+    _ws_has,
+)
+from reproducibility_project.tests.base_test import BaseTest
+
+
+def _replace_sequentially(text, keywords, variables):
+    for keyword, variable in zip(keywords, variables):
+        text = text.replace(keyword, str(variable))
+    return text
+
+
+class TestMcccsProject(BaseTest):
+    def test_ws_has(self, tmp_path):
+        job = SimpleNamespace(ws=str(tmp_path))
+        assert not _ws_has(job, "fort.77")
+        (tmp_path / "fort.77").touch()
+        assert _ws_has(job, "fort.77")
+
+    def test_ws_has_unchanged_mtime(self, tmp_path):
+        job = SimpleNamespace(ws=str(tmp_path))
+        (tmp_path / "fort.4.melt").touch()
+        stat = os.stat(tmp_path)
+        assert _ws_has(job, "fort.4.melt")
+        # Create a file without the directory mtime moving on, as on file
+        # systems with a coarse mtime resolution.
+        (tmp_path / "fort.77").touch()
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert _ws_has(job, "fort.77")
+
+    def test_ws_has_several_names_one_stat(self, tmp_path, monkeypatch):
+        job = SimpleNamespace(ws=str(tmp_path))
+        names = ["fort.4.melt", "fort.4.cool", "fort.4.equil", "fort.4.prod"]
+        for name in names:
+            (tmp_path / name).touch()
+        assert _ws_has(job, *names)
+        assert not _ws_has(job, *names, "fort.77")
+
+        calls = []
+        stat = os.stat
+
+        def counting_stat(*args, **kwargs):
+            calls.append(args[0])
+            return stat(*args, **kwargs)
+
+        monkeypatch.setattr(project.os, "stat", counting_stat)
+        assert _ws_has(job, *names)
+        assert calls == [str(tmp_path)]
+
+    def test_stage_finished_same_mtime(self, tmp_job):
+        run_file = os.path.join(tmp_job.ws, "run.melt")
+        with open(run_file, "w") as f:
+            f.write("running\n")
+        stat = os.stat(run_file)
+        assert not project._stage_finished(tmp_job, "melt")
+
+        # Rewrite the file without moving its mtime, as a coarse clock would.
+        with open(run_file, "w") as f:
+            f.write("running\nProgram ended\n")
+        os.utime(run_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert project._stage_finished(tmp_job, "melt")
+        project._finished_cache.clear()
+        assert project._stage_finished(tmp_job, "melt")
+
+    def test_workspace_edits_leave_templates_unchanged(
+        self, tmp_path, tmp_project, monkeypatch
+    ):
+        template_dir = tmp_path / "engine_input"
+        template_dir.mkdir()
+        fort4 = "NCHAIN LENGTH TEMPERATURE PRESSURE SEED RCUT\n"
+        topmon = "ltailc= F\nlshift= F\n"
+        for step in ["melt", "cool", "equil", "prod"]:
+            (template_dir / "fort.4.{}".format(step)).write_text(fort4)
+        (template_dir / "topmon.inp").write_text(topmon)
+        monkeypatch.setattr(
+            project, "_engine_input_dir", lambda *args: str(template_dir)
+        )
+
+        job = tmp_project.open_job(
+            {
+                "engine": "mcccs",
+                "ensemble": "NPT",
+                "molecule": "pentaneUA",
+                "replica": 0,
+                "N_liquid": 5,
+                "box_L_liq": 2.0,
+                "temperature": 300.0,
+                "pressure": 1000.0,
+                "r_cut": 1.4,
+                "cutoff_style": "shift",
+                "long_range_correction": "energy_pressure",
+            }
+        ).init()
+        project.copy_files(job)
+        project.copy_topmon(job)
+        project.replace_keyword_fort_files_npt(job)
+        project.replace_lrc_shift_topmon(job)
+
+        for step in ["melt", "cool", "equil", "prod"]:
+            name = "fort.4.{}".format(step)
+            assert (template_dir / name).read_text() == fort4
+            with open(os.path.join(job.ws, name)) as f:
+                assert f.read() == "5 20.0 300.0 1.0 0 14.0\n"
+        assert (template_dir / "topmon.inp").read_text() == topmon
+        with open(os.path.join(job.ws, "topmon.inp")) as f:
+            assert f.read() == "ltailc= T\nlshift= T\n"
+
+    def test_replace_keywords_npt(self, tmp_path):
+        keywords = [
+            "NCHAIN",
+            "LENGTH",
+            "TEMPERATURE",
+            "PRESSURE",
+            "SEED",
+            "RCUT",
+        ]
+        variables = [5, 20.0, 300.0, 1.0, 0, 14.0]
+        text = "NCHAIN LENGTH TEMPERATURE PRESSURE SEED RCUT\nnchain= NCHAIN\n"
+        fort4 = tmp_path / "fort.4.melt"
+        fort4.write_text(text)
+        _replace_keywords(str(fort4), *_keyword_pattern(keywords, variables))
+        assert fort4.read_text() == _replace_sequentially(
+            text, keywords, variables
+        )
+        assert fort4.read_text() == "5 20.0 300.0 1.0 0 14.0\nnchain= 5\n"
+
+    def test_replace_keywords_gemc_overlapping(self, tmp_path):
+        keywords = ["NCHAIN1", "NCHAIN2", "TEMPERATURE", "NCHAINTOT", "INIX1"]
+        variables = [10, 2, 300.0, 12, 4]
+        text = "NCHAINTOT\nNCHAIN1 NCHAIN2\nINIX1 TEMPERATURE\n"
+        fort4 = tmp_path / "fort.4.melt"
+        fort4.write_text(text)
+        _replace_keywords(str(fort4), *_keyword_pattern(keywords, variables))
+        assert fort4.read_text() == _replace_sequentially(
+            text, keywords, variables
+        )
+        assert fort4.read_text() == "12\n10 2\n4 300.0\n"
@@ -1,5 +1,8 @@
+import numpy as np
+
 from reproducibility_project.src.molecules.system_builder import (
     construct_system,
+    get_molecule,
 )
 from reproducibility_project.tests.base_test import BaseTest
 
@@ -12,3 +15,43 @@ class TestSystemBuilder(BaseTest):
 
     def test_liq_and_vap(self, mock_job_gemc):
         systems = construct_system(mock_job_gemc)
+
+    def test_get_molecule(self, mock_job_npt, monkeypatch):
+        from reproducibility_project.src.molecules import system_builder
+
+        def not_requested():
+            raise AssertionError("built a molecule that was not requested")
+
+        for name in ["MethaneUA", "BenzeneUA", "WaterSPC", "EthanolAA"]:
+            monkeypatch.setattr(system_builder, name, not_requested)
+        molecule = get_molecule(mock_job_npt)
+        assert molecule.name == "pentaneUA"
+
+    def test_constrain_matches_per_molecule_solve(self, tmp_project):
+        from constrainmol import ConstrainedMolecule
+
+        from reproducibility_project.src.utils.forcefields import load_ff
+
+        sp = tmp_project.open_job(
+            {
+                "molecule": "pentaneUA",
+                "N_liquid": 5,
+                "N_vap": None,
+                "box_L_liq": 2.0,
+                "box_L_vap": None,
+                "forcefield_name": "trappe-ua",
+            }
+        ).sp
+        constrained = construct_system(sp, constrain=True)[0]
+
+        # Reference: constrain each molecule of the same packed box in turn.
+        reference = construct_system(sp)[0]
+        molecule = get_molecule(sp)
+        typed_molecule = load_ff(sp.forcefield_name).apply(molecule.to_parmed())
+        constrain_mol = ConstrainedMolecule(typed_molecule)
+        for mol in reference.children:
+            constrain_mol.update_xyz(mol.xyz * 10)
+            constrain_mol.solve()
+            mol.xyz = constrain_mol.xyz / 10.0
+
+        assert np.allclose(constrained.xyz, reference.xyz)
@@ -21,3 +21,6 @@ class TestForcefields(BaseTest):
     def test_correct_ff_names(self, ff_name):
         ff = load_ff(name=ff_name)
         assert isinstance(ff, Forcefield)
+
+    def test_ff_loaded_once(self):
+        assert load_ff(name="trappe-ua") is load_ff(name="trappe-ua")